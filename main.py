@@ -2,12 +2,24 @@ import time
 import re
 import shutil
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
 import os
 import csv
 import hashlib
 import random
-from datetime import datetime
-from urllib import parse
+import html
+import atexit
+import subprocess
+import tempfile
+import json
+import itertools
+import threading
+from functools import lru_cache
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 # Use the modern zoneinfo if available (Python 3.9+), otherwise fall back to pytz
 try:
@@ -15,184 +27,792 @@ try:
 except ImportError:
     from pytz import timezone as ZoneInfo
 
+# Use the C-backed selectolax parser for meta tags if installed, otherwise fall back to a regex scan
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.selenium_manager import SeleniumManager
+from selenium.common.exceptions import TimeoutException, WebDriverException
 
 # --- Config ---
-LAST_PIC_HASH_FILE = "last_pic_hash.txt"
+LAST_PIC_STATE_FILE = "last_pic_state.json"
 PIC_DIR       = "profile_pics"
+PIC_HASH_DIR  = os.path.join(PIC_DIR, "by_hash")
+# Stored as "<algo>:<hex>"; older state holds bare MD5 hex, which is still compared until replaced
+PIC_HASH_ALGO = "sha256"
 LOG_FILE      = "profile_log.csv"
+LOG_FIELDS    = ["timestamp", "username", "posts", "followers", "following", "is_picture_updated"]
+# Pulls an entry's values out in column order in one C call, instead of DictWriter's per-row key checks
+_log_row      = itemgetter(*LOG_FIELDS)
+# Resolved once at import rather than on every scrape_and_log call
+WARSAW_TZ     = ZoneInfo("Europe/Warsaw")
+USER_AGENT    = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
+CHROME_ARGS   = [
+    "--headless=new",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--window-size=1920,1080",
+    "--lang=en-US,en",
+    f"--user-agent={USER_AGENT}",
+    # Unlike CHROME_PREFS this also reaches the Chrome launched for CHROME_DEBUG_PORT attach
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-notifications",
+    # Fewer renderer processes per page, and no translate bar work
+    "--disable-features=IsolateOrigins,site-per-process,Translate",
+]
+# Only the DOM and meta tags are read, so skip downloading images; CSS is cut by BLOCKED_URL_PATTERNS
+CHROME_PREFS  = {
+    "profile.managed_default_content_settings.images": 2,
+}
+_BLOCKED_EXTENSIONS = ["jpg", "jpeg", "png", "gif", "webp", "mp4", "webm", "woff", "woff2", "ttf", "css"]
+# CDP matches each pattern against the whole URL, query string included, so CDN URLs like
+# ".jpg?stp=...&_nc_ht=..." need the "?*" form. A plain trailing "*" would also catch profile
+# URLs such as /john.gifford/. Static CSS/images under /rsrc.php/ end in these extensions too;
+# rsrc.php as a whole isn't blocked because it also serves the JS that renders the profile.
+# Tracker paths need a segment before them so profiles like /trackingfan/ still load
+BLOCKED_URL_PATTERNS = [p for ext in _BLOCKED_EXTENSIONS for p in (f"*.{ext}", f"*.{ext}?*")] + [
+    "*://*/*/analytics*", "*://*/*/tracking*",
+]
+# Client-side request budget shared by all workers, to stay under Instagram's rate limits
+REQUESTS_PER_SECOND = float(os.environ.get("IG_REQUESTS_PER_SECOND", "1"))
+REQUEST_BURST       = 4
+# Resolved chromedriver paths, keyed by Chrome binary + mtime so a Chrome upgrade re-resolves
+DRIVER_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ig-scraper")
+# Set CHROME_DEBUG_PORT to keep one Chrome alive and attach to it instead of launching per scrape
+CHROME_DEBUG_PORT = os.environ.get("CHROME_DEBUG_PORT")
+
+# Compiled once at import; these run over the full profile HTML on every scrape
+_META_TAG_RE  = re.compile(r"<meta\b[^>]*>", re.IGNORECASE)
+_META_ATTR_RE = re.compile(r'([\w:-]+)\s*=\s*(["\'])(.*?)\2', re.DOTALL)
+_STAT_RE      = re.compile(r"(\d[\d.,]*[kmb]?)\s+(posts|followers|following)\b", re.IGNORECASE)
+_COUNT_RE     = re.compile(r"\d[\d.,]*[kmb]?", re.IGNORECASE)
+
+# Everything the Selenium fallback reads, collected in one WebDriver round-trip
+_PROFILE_DOM_JS = """
+const meta = (sel) => { const m = document.querySelector(sel); return m ? m.content : null; };
+const img = document.querySelector("img[alt$='profile picture'], img[alt*='Profile picture'], header img");
+const stats = [];
+for (const li of document.querySelectorAll("header section > ul > li")) {
+    const count = li.querySelector("span, button");
+    stats.push([li.innerText, count ? count.innerText : ""]);
+}
+return {
+    pic: meta("meta[property='og:image']") || (img && img.src) || null,
+    desc: meta("meta[name='description']") || meta("meta[property='og:description']"),
+    stats: stats,
+    login: !!document.querySelector("input[name='password']"),
+    path: location.pathname,
+};
+"""
+# Resolves as soon as a DOM mutation renders the stats (or the login wall), in one round-trip
+_PROFILE_DOM_WAIT_JS = """
+const done = arguments[arguments.length - 1];
+const expectedPath = arguments[1];
+const STAT_RE_SOURCE = """ + json.dumps(_STAT_RE.pattern) + r""";
+const read = () => {""" + _PROFILE_DOM_JS + r"""};
+// The server-rendered meta description usually has all three counts well before the header list renders;
+// STAT_RE_SOURCE is _STAT_RE's own pattern so this agrees with _parse_stats_from_description
+const descStats = (s) => new Set(Array.from((s || "").matchAll(new RegExp(STAT_RE_SOURCE, "gi")), (m) => m[2].toLowerCase())).size === 3;
+// With pageLoadStrategy "none" the previous document can still be showing; only trust the requested profile
+const onProfile = (d) => d.path.replace(/\/+$/, "").toLowerCase() === expectedPath;
+const ready = (d) => d.login || (onProfile(d) && (d.stats.length > 0 || descStats(d.desc)));
+const first = read();
+if (ready(first)) { done(first); return; }
+let timer = null;
+const obs = new MutationObserver(() => {
+    const d = read();
+    if (ready(d)) { obs.disconnect(); clearTimeout(timer); done(d); }
+});
+timer = setTimeout(() => { obs.disconnect(); done(read()); }, arguments[0]);
+obs.observe(document.documentElement, {childList: true, subtree: true});
+"""
+
+# Chrome processes this run launched for CHROME_DEBUG_PORT (keyed by port); stopped at exit
+_chrome_procs = {}
+# Drivers kept open across a batch, one per worker thread (keyed by thread ident)
+_reusable_drivers = {}
+_drivers_lock = threading.Lock()
+_state_lock = threading.Lock()
+# LAST_PIC_STATE_FILE contents, read once per process; this process is the only writer
+_pic_state = None
+# Picture directories already created by this process
+_made_dirs = set()
+_log_lock = threading.Lock()
+# Whether LOG_FILE already starts with a header; checked on the first append only
+_log_has_header = None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0:
+            raise ValueError(f"TokenBucket rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            # Jitter so parallel workers don't wake up in lockstep
+            time.sleep(wait + random.uniform(0, 0.25))
+
+class _RateLimitedSession(requests.Session):
+    def __init__(self, bucket: TokenBucket):
+        super().__init__()
+        self._bucket = bucket
+
+    def request(self, *args, **kwargs):
+        self._bucket.acquire()
+        return super().request(*args, **kwargs)
+
+# One pooled keep-alive session for Instagram and its CDN, so repeat requests skip the TLS handshake.
+# 429/503 honour Retry-After; other retries back off exponentially with jitter.
+_SESSION = _RateLimitedSession(TokenBucket(REQUESTS_PER_SECOND, REQUEST_BURST))
+_SESSION.headers.update({"User-Agent": USER_AGENT})
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=1.5,
+        backoff_jitter=1.0,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+    ),
+))
+# Each scrape_many worker attaches to its own Chrome on CHROME_DEBUG_PORT + offset
+_thread_state = threading.local()
+_port_offsets = itertools.count()
 
 # --- Helpers ---
-def load_last_pic_hash():
-    if os.path.exists(LAST_PIC_HASH_FILE):
-        with open(LAST_PIC_HASH_FILE, "r") as f:
-            return f.read().strip()
-    return None
+def _load_pic_state() -> dict:
+    # Callers hold _state_lock
+    global _pic_state
+    if _pic_state is None:
+        try:
+            with open(LAST_PIC_STATE_FILE, "r") as f:
+                _pic_state = json.load(f)
+        except FileNotFoundError:
+            _pic_state = {}
+    return _pic_state
+
+def load_last_pic_state(username: str) -> dict:
+    # Per user: "hash" of the last saved picture, plus the "url", "etag" and
+    # "last_modified" of the last download for conditional requests
+    with _state_lock:
+        return dict(_load_pic_state().get(username, {}))
+
+def save_last_pic_state(username: str, **fields):
+    # Update the cached state and write it back under the lock so concurrent scrapes don't drop each other's state
+    with _state_lock:
+        state = _load_pic_state()
+        state.setdefault(username, {}).update(fields)
+        # Write then rename, so a crash mid-write can't leave a truncated file that makes every picture look new
+        tmp_path = f"{LAST_PIC_STATE_FILE}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, LAST_PIC_STATE_FILE)
 
-def save_last_pic_hash(h: str):
-    with open(LAST_PIC_HASH_FILE, "w") as f:
-        f.write(h)
+def _csv_has_header(path: str) -> bool:
+    return os.path.exists(path) and os.path.getsize(path) > 0
 
 def log_to_csv(entry: dict):
-    is_new = not os.path.exists(LOG_FILE)
-    with open(LOG_FILE, "a", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=[
-            "timestamp", "posts", "followers", "following", "is_picture_updated"
-        ])
+    global _log_has_header
+    # Concurrent appends from scrape_many workers could interleave rows without the lock
+    with _log_lock:
+        if _log_has_header is None:
+            _log_has_header = _csv_has_header(LOG_FILE)
+        with open(LOG_FILE, "a", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            if not _log_has_header:
+                writer.writerow(LOG_FIELDS)
+                _log_has_header = True
+            writer.writerow(_log_row(entry))
+
+class CsvLogger:
+    # Batch runs open LOG_FILE once with a large buffer instead of open/append/close per row
+    def __init__(self, path: str = LOG_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        is_new = not _csv_has_header(self.path)
+        self._file = open(self.path, "a", newline="", encoding="utf-8", buffering=1 << 16)
+        self._writer = csv.writer(self._file)
         if is_new:
-            writer.writeheader()
-        writer.writerow(entry)
+            self._writer.writerow(LOG_FIELDS)
+        return self
+
+    def write(self, entry: dict):
+        with self._lock:
+            self._writer.writerow(_log_row(entry))
 
-def _get_profile_img_src_from_page(driver) -> str | None:
+    def __exit__(self, *exc):
+        self._file.close()
+
+def _ensure_dir(path: str):
+    if path not in _made_dirs:
+        os.makedirs(path, exist_ok=True)
+        _made_dirs.add(path)
+
+class _HashingReader:
+    # Feeds every block shutil.copyfileobj reads into the digests, keeping the copy single-pass
+    def __init__(self, raw, digests):
+        self._raw = raw
+        self._digests = digests
+
+    def read(self, size=-1) -> bytes:
+        # response.raw raises urllib3's own errors; translate them the way iter_content does, so a
+        # dropped or truncated body is a RequestException that scrape_and_log handles and still logs
+        try:
+            data = self._raw.read(size)
+        except ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e) from e
+        except DecodeError as e:
+            raise requests.exceptions.ContentDecodingError(e) from e
+        except ReadTimeoutError as e:
+            raise requests.exceptions.ConnectionError(e) from e
+        for digest in self._digests:
+            digest.update(data)
+        return data
+
+def _download_to_temp(response: requests.Response, algorithms=(PIC_HASH_ALGO,)) -> tuple[str, dict[str, str]]:
+    # Hash while streaming to a temp file, so unchanged pictures are never held in memory or kept
+    _ensure_dir(PIC_DIR)
+    digests = [hashlib.new(name) for name in algorithms]
+    response.raw.decode_content = True
+    with tempfile.NamedTemporaryFile("wb", dir=PIC_DIR, suffix=".part", delete=False) as f:
+        try:
+            shutil.copyfileobj(_HashingReader(response.raw, digests), f, 1024 * 1024)
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    # NamedTemporaryFile creates 0600; saved pictures should get normal file permissions
+    os.chmod(f.name, 0o644)
+    return f.name, {digest.name: digest.hexdigest() for digest in digests}
+
+def _matches_last_download(response: requests.Response, last_state: dict, url: str) -> bool:
+    # Some CDN edges ignore If-None-Match and answer 200 anyway; the streamed
+    # response's headers arrive before the body, so compare them before reading it
+    if last_state.get("url") != url:
+        return False
+    etag = response.headers.get("ETag")
+    if etag and etag == last_state.get("etag"):
+        return True
+    last_modified = response.headers.get("Last-Modified")
+    return bool(not etag and last_modified and last_modified == last_state.get("last_modified"))
+
+def _store_picture(tmp_path: str, digest: str, path: str):
+    # Keep one canonical copy per content hash; a reverted avatar costs only a new link
+    canonical = os.path.join(PIC_HASH_DIR, f"{digest}.jpg")
+    if os.path.exists(canonical):
+        os.remove(tmp_path)
+    else:
+        _ensure_dir(PIC_HASH_DIR)
+        os.replace(tmp_path, canonical)
     try:
-        og = driver.find_element(By.CSS_SELECTOR, "meta[property='og:image']")
-        return og.get_attribute("content")
-    except Exception:
-        pass
+        os.link(canonical, path)
+    except OSError:
+        shutil.copyfile(canonical, path)
+
+def _fetch_profile_html(username: str, session_id: str | None) -> str | None:
+    headers = {'Accept-Language': 'en-US,en;q=0.9'}
+    cookies = {'sessionid': session_id} if session_id else None
     try:
-        header_img = driver.find_element(By.CSS_SELECTOR, "header img")
-        return header_img.get_attribute("src")
-    except Exception:
+        with _SESSION.get(f"https://www.instagram.com/{username}/", headers=headers, cookies=cookies, timeout=15, stream=True) as resp:
+            resp.raise_for_status()
+            # Logged-out or expired sessions get redirected to the login wall
+            if "/accounts/login" in resp.url:
+                return None
+            # Only <head> is parsed, so stop downloading once it's closed instead of pulling the whole page
+            buf = bytearray()
+            for chunk in resp.iter_content(chunk_size=16 * 1024):
+                start = max(0, len(buf) - 6)
+                buf += chunk
+                if buf.find(b"</head>", start) != -1:
+                    break
+            return buf.decode(resp.encoding or "utf-8", errors="replace")
+    except requests.exceptions.RequestException as e:
+        print(f"Could not fetch profile HTML: {e}")
         return None
 
-def _get_biggest_profile_pic_url(username: str, session_id: str | None) -> str | None:
+def _parse_meta_tags(html_text: str) -> dict[str, str]:
+    # property/name -> content for every <meta>, first occurrence wins; one pass over the page.
+    # The tags we need live in <head>, so don't scan (or build a tree for) the much larger body.
+    head_end = html_text.find("</head>")
+    if head_end != -1:
+        html_text = html_text[:head_end]
+    metas = {}
+    if LexborHTMLParser is not None:
+        for node in LexborHTMLParser(html_text).css("meta[content]"):
+            key = node.attributes.get("property") or node.attributes.get("name")
+            if key and node.attributes.get("content"):
+                metas.setdefault(key, node.attributes["content"])
+        return metas
+    # Instagram emits attributes in either order, so parse each tag instead of one fixed pattern
+    for tag in _META_TAG_RE.findall(html_text):
+        attrs = {k.lower(): v for k, _, v in _META_ATTR_RE.findall(tag)}
+        key = attrs.get("property") or attrs.get("name")
+        if key and attrs.get("content"):
+            metas.setdefault(key, html.unescape(attrs["content"]))
+    return metas
+
+def _parse_stats_from_description(desc: str) -> tuple[str | None, str | None, str | None]:
+    # e.g. "31 Followers, 90 Following, 803 Posts - See Instagram photos and videos from ..."
+    # One scan for all three labels; the first occurrence of each wins
+    counts = {}
+    for m in _STAT_RE.finditer(desc):
+        counts.setdefault(m.group(2).lower(), m.group(1).replace(",", ""))
+    return counts.get("posts"), counts.get("followers"), counts.get("following")
+
+def _profile_path(username: str) -> str:
+    return f"/{username}".lower()
+
+def _on_profile(dom: dict, username: str) -> bool:
+    return dom["path"].rstrip("/").lower() == _profile_path(username)
+
+def _read_profile_dom(driver, username: str) -> dict | None:
+    dom = driver.execute_script(_PROFILE_DOM_JS)
+    # Falsy until the login wall, or this profile's stats (list or full description), are there, so WebDriverWait keeps polling
+    if dom["login"]:
+        return dom
+    if _on_profile(dom, username) and (dom["stats"] or all(_parse_stats_from_description(dom["desc"] or ""))):
+        return dom
+    return None
+
+def _get_profile_dom(driver, username: str, timeout: float = 10) -> dict:
+    driver.set_script_timeout(timeout + 5)
+    try:
+        return driver.execute_async_script(_PROFILE_DOM_WAIT_JS, int(timeout * 1000), _profile_path(username))
+    except WebDriverException:
+        # The document was swapped mid-wait (navigation still in flight); poll the new one instead
+        pass
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.1).until(lambda d: _read_profile_dom(d, username))
+    except TimeoutException:
+        return driver.execute_script(_PROFILE_DOM_JS)
+
+def _fetch_profile_json(username: str, session_id: str | None) -> dict | None:
     if not session_id:
         return None
-    headers = {
-        'x-ig-app-id': '936619743392459',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36'
-    }
+    headers = {'x-ig-app-id': '936619743392459'}
     cookies = {'sessionid': session_id}
     try:
         user_info_url = f"https://www.instagram.com/api/v1/users/web_profile_info/?username={username}"
-        user_info_resp = requests.get(user_info_url, headers=headers, cookies=cookies, timeout=15)
+        user_info_resp = _SESSION.get(user_info_url, headers=headers, cookies=cookies, timeout=15)
         user_info_resp.raise_for_status()
-        user_id = user_info_resp.json().get('data', {}).get('user', {}).get('id')
+        return (user_info_resp.json().get('data') or {}).get('user') or None
+    # Transient 429/5xx are already retried with backoff by _SESSION; anything else here is a real bug
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Could not fetch profile JSON via API: {e}")
+        return None
+
+def _get_biggest_profile_pic_url(username: str, session_id: str | None, user_id: str | None = None) -> str | None:
+    if not session_id:
+        return None
+    if not user_id:
+        user_id = (_fetch_profile_json(username, session_id) or {}).get('id')
         if not user_id: return None
+    headers = {'x-ig-app-id': '936619743392459'}
+    cookies = {'sessionid': session_id}
+    try:
         detail_info_url = f"https://i.instagram.com/api/v1/users/{user_id}/info/"
-        detail_info_resp = requests.get(detail_info_url, headers=headers, cookies=cookies, timeout=15)
+        detail_info_resp = _SESSION.get(detail_info_url, headers=headers, cookies=cookies, timeout=15)
         detail_info_resp.raise_for_status()
-        hd_versions = detail_info_resp.json().get('user', {}).get('hd_profile_pic_versions', [])
-        return hd_versions[0].get('url') if hd_versions else detail_info_resp.json().get('user', {}).get('profile_pic_url_hd')
-    except Exception as e:
+        user = detail_info_resp.json().get('user') or {}
+        hd_versions = user.get('hd_profile_pic_versions') or []
+        return hd_versions[0].get('url') if hd_versions else user.get('profile_pic_url_hd')
+    except (requests.exceptions.RequestException, ValueError) as e:
         print(f"Could not fetch biggest profile picture via API: {e}")
         return None
 
-def _get_profile_stats(driver) -> tuple[str | None, str | None, str | None]:
+def _get_profile_stats(dom: dict) -> tuple[str | None, str | None, str | None]:
+    # The meta description is parsed locally and usually complete; the header list covers the rest
+    from_desc = _parse_stats_from_description(dom["desc"] or "")
+    if all(from_desc):
+        return from_desc
     posts, followers, following = None, None, None
+    for text, count_text in dom["stats"]:
+        # Plain "803" is the common case; only compact/grouped counts need the regex
+        if count_text.isdigit():
+            count = count_text
+        else:
+            m = _COUNT_RE.search(count_text)
+            if not m:
+                continue
+            count = m.group(0).replace(",", "")
+        text = text.lower()
+        if "posts" in text:
+            posts = count
+        elif "followers" in text:
+            followers = count
+        elif "following" in text:
+            following = count
+    if any([posts, followers, following]):
+        return posts, followers, following
+    return from_desc
+
+def _display_count(count: int) -> str:
+    # The JSON API has exact counts; log them the way the page shows them ("803", "12.3K", "1.2M"),
+    # rounded down like Instagram, so profile_log.csv doesn't change format with the data source
+    if count < 10_000:
+        return str(count)
+    for unit, suffix in ((10**9, "B"), (10**6, "M"), (10**3, "K")):
+        if count >= unit:
+            break
+    tenths = count * 10 // unit
+    if tenths >= 1000:
+        return f"{tenths // 10}{suffix}"
+    whole, frac = divmod(tenths, 10)
+    return f"{whole}.{frac}{suffix}" if frac else f"{whole}{suffix}"
+
+def _scrape_via_http(username: str, session_id: str | None):
+    # With a session the JSON API has exact counts and the user id in one call, so the HTML page isn't needed
+    user = _fetch_profile_json(username, session_id)
+    user_id = user.get("id") if user else None
+    if user:
+        counts = [(user.get(k) or {}).get("count") for k in ("edge_owner_to_timeline_media", "edge_followed_by", "edge_follow")]
+        if all(c is not None for c in counts):
+            pic_url = _get_biggest_profile_pic_url(username, session_id, user_id) or user.get("profile_pic_url_hd")
+            if pic_url:
+                posts, followers, following = (_display_count(c) for c in counts)
+                return posts, followers, following, pic_url
+    html_text = _fetch_profile_html(username, session_id)
+    if not html_text:
+        return None
+    meta = _parse_meta_tags(html_text)
+    posts, followers, following = _parse_stats_from_description(meta.get("description") or meta.get("og:description") or "")
+    if not all([posts, followers, following]):
+        return None
+    pic_url = (user_id and _get_biggest_profile_pic_url(username, session_id, user_id)) or meta.get("og:image")
+    if not pic_url:
+        return None
+    return posts, followers, following, pic_url
+
+# Both lookups are stable for the life of the process; resolve them once per run
+@lru_cache(maxsize=1)
+def _chrome_binary() -> str | None:
+    return os.environ.get("CHROME_PATH") or shutil.which("google-chrome") or shutil.which("chromium")
+
+@lru_cache(maxsize=1)
+def _chromedriver_path() -> str | None:
+    path = os.environ.get("CHROMEDRIVER_PATH") or shutil.which("chromedriver")
+    if path:
+        return path
+    # Otherwise Selenium Manager would re-resolve (and maybe hit the network) on every
+    # Service(); ask it once per Chrome build and remember the answer on disk
+    chrome = _chrome_binary()
+    if not chrome:
+        return None
+    key = hashlib.md5(f"{chrome}:{os.path.getmtime(chrome)}".encode()).hexdigest()
+    cache_file = os.path.join(DRIVER_CACHE_DIR, f"chromedriver-{key}")
     try:
-        stat_elements = WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "header section > ul > li"))
-        )
-        for item in stat_elements:
-            text = item.text.lower()
-            count_text = item.find_element(By.CSS_SELECTOR, 'span, button').text
-            count = count_text.split()[0].replace(",", "")
-            if "posts" in text:
-                posts = count
-            elif "followers" in text:
-                followers = count
-            elif "following" in text:
-                following = count
-        if any([posts, followers, following]):
-            return posts, followers, following
-    except Exception:
-        pass
-    return None, None, None
+        with open(cache_file, "r") as f:
+            cached = f.read().strip()
+    except FileNotFoundError:
+        cached = None
+    if cached and os.path.isfile(cached):
+        return cached
+    try:
+        path = SeleniumManager().binary_paths(["--browser", "chrome", "--browser-path", chrome])["driver_path"]
+    except Exception as e:
+        print(f"Could not resolve chromedriver via Selenium Manager: {e}")
+        return None
+    os.makedirs(DRIVER_CACHE_DIR, exist_ok=True)
+    with open(cache_file, "w") as f:
+        f.write(path)
+    return path
 
-def scrape_and_log(username: str):
-    profile_url = f"https://www.instagram.com/{username}/"
+def _chrome_is_listening(address: str) -> bool:
+    try:
+        return requests.get(f"http://{address}/json/version", timeout=1).ok
+    except requests.exceptions.RequestException:
+        return False
+
+def _launch_chrome_service(port: int) -> str:
+    address = f"127.0.0.1:{port}"
+    # Reuse a Chrome that is already serving this port (ours or a previous run's)
+    if _chrome_is_listening(address):
+        return address
+    chrome = _chrome_binary()
+    if not chrome:
+        raise RuntimeError("CHROME_DEBUG_PORT is set but no Chrome binary was found (set CHROME_PATH).")
+    user_data_dir = os.path.join(tempfile.gettempdir(), f"ig-chrome-{port}")
+    proc = subprocess.Popen(
+        [chrome, *CHROME_ARGS, f"--remote-debugging-port={port}", f"--user-data-dir={user_data_dir}"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    _chrome_procs[port] = proc
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        if _chrome_is_listening(address):
+            print(f"Started persistent Chrome on {address}.")
+            return address
+        time.sleep(0.2)
+    raise RuntimeError(f"Chrome did not open its debugging port on {address}.")
+
+@atexit.register
+def _stop_chrome_procs():
+    procs = list(_chrome_procs.values())
+    _chrome_procs.clear()
+    for proc in procs:
+        proc.terminate()
+    # Wait so Chrome can flush its profile; kill any that hang
+    for proc in procs:
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def _attach_driver(address: str):
     options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--lang=en-US,en")
-    options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36")
+    options.debugger_address = address
+    options.page_load_strategy = "none"
+    service = Service(executable_path=_chromedriver_path())
+    return webdriver.Chrome(service=service, options=options)
+
+def _debug_port() -> int:
+    if not hasattr(_thread_state, "port"):
+        _thread_state.port = int(CHROME_DEBUG_PORT) + next(_port_offsets)
+    return _thread_state.port
+
+def _build_driver():
+    if CHROME_DEBUG_PORT:
+        driver = _attach_driver(_launch_chrome_service(_debug_port()))
+    else:
+        options = Options()
+        for arg in CHROME_ARGS:
+            options.add_argument(arg)
+        options.add_experimental_option("prefs", CHROME_PREFS)
+        # driver.get() returns immediately; _get_profile_dom waits for exactly what we read
+        options.page_load_strategy = "none"
+        service = Service(executable_path=_chromedriver_path())
+        driver = webdriver.Chrome(service=service, options=options)
+    # CDP blocking also covers attached browsers, where launch prefs can't be applied.
+    # Picture URLs are still read from the DOM; only the bytes are skipped.
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
+
+def _get_reusable_driver():
+    ident = threading.get_ident()
+    with _drivers_lock:
+        driver = _reusable_drivers.get(ident)
+    if driver is None:
+        driver = _build_driver()
+        with _drivers_lock:
+            _reusable_drivers[ident] = driver
+    return driver
+
+def _discard_reusable_driver(driver):
+    with _drivers_lock:
+        for ident, d in list(_reusable_drivers.items()):
+            if d is driver:
+                del _reusable_drivers[ident]
+
+def quit_reusable_drivers():
+    with _drivers_lock:
+        drivers = list(_reusable_drivers.values())
+        _reusable_drivers.clear()
+    for driver in drivers:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+_AUTH_FAILED_MSG = (
+    "Authentication failed: Landed on a login page. "
+    "Your INSTAGRAM_SESSION_ID cookie is likely expired or invalid. "
+    "Please update it in your GitHub Secrets."
+)
+
+def _session_redirects_to_login(username: str, session_id: str) -> bool:
+    # A dead sessionid gets a bodiless 302 to the login wall, no need to boot Chrome to find out
+    try:
+        resp = _SESSION.head(
+            f"https://www.instagram.com/{username}/",
+            cookies={'sessionid': session_id}, allow_redirects=False, timeout=10,
+        )
+    except requests.exceptions.RequestException:
+        return False
+    return resp.is_redirect and "/accounts/login" in resp.headers.get("Location", "")
 
+def _scrape_via_selenium(username: str, session_id: str | None, reuse_driver: bool = False, probe_session: bool = False):
+    profile_url = f"https://www.instagram.com/{username}/"
+    if probe_session and session_id and _session_redirects_to_login(username, session_id):
+        raise RuntimeError(_AUTH_FAILED_MSG)
     driver = None
+    # The API picture lookup doesn't need the browser, so let it run while the page loads
+    api_pool = ThreadPoolExecutor(max_workers=1)
+    pic_future = api_pool.submit(_get_biggest_profile_pic_url, username, session_id)
     try:
-        service = Service(executable_path=os.environ.get("CHROMEDRIVER_PATH"))
-        driver = webdriver.Chrome(service=service, options=options)
+        # When attached to a persistent Chrome, quit() only ends the session, not the browser
+        driver = _get_reusable_driver() if reuse_driver else _build_driver()
         
-        session_id = os.environ.get("INSTAGRAM_SESSION_ID")
         if session_id:
-            driver.get("https://www.instagram.com/")
-            driver.add_cookie({'name': 'sessionid', 'value': session_id, 'domain': '.instagram.com'})
+            # CDP can set the cookie before any navigation, so the profile is the only page load
+            # (add_cookie needs an instagram.com document loaded first)
+            driver.execute_cdp_cmd("Network.setCookie", {
+                "name": "sessionid", "value": session_id, "domain": ".instagram.com",
+                "path": "/", "secure": True, "httpOnly": True,
+            })
             print("Successfully added session cookie.")
         
+        if reuse_driver or CHROME_DEBUG_PORT:
+            # A reused driver or an attached Chrome's tab may still show an earlier page (even this
+            # same profile from a previous run); unload it so it can't be read back as fresh
+            driver.get("about:blank")
         driver.get(profile_url)
         # ADDED: Random delay to mimic human behavior
         time.sleep(random.uniform(4, 8))
 
-        if driver.find_elements(By.NAME, "password"):
-            raise RuntimeError(
-                "Authentication failed: Landed on a login page. "
-                "Your INSTAGRAM_SESSION_ID cookie is likely expired or invalid. "
-                "Please update it in your GitHub Secrets."
-            )
+        dom = _get_profile_dom(driver, username)
+        if dom["login"]:
+            raise RuntimeError(_AUTH_FAILED_MSG)
+        if not _on_profile(dom, username):
+            raise RuntimeError(f"Profile page for {username} did not load (still on {dom['path']}).")
         print("Authentication successful, proceeding with scrape.")
 
-        posts, followers, following = _get_profile_stats(driver)
-        pic_url_to_check = _get_biggest_profile_pic_url(username, session_id) or _get_profile_img_src_from_page(driver)
-        
-        if not pic_url_to_check:
-            raise RuntimeError("Could not locate profile picture using any method.")
-
-        is_updated = 0
-        try:
-            # ADDED: Random delay before image download
-            time.sleep(random.uniform(2, 5))
-            response = requests.get(pic_url_to_check, timeout=30)
-            response.raise_for_status()
-            image_content = response.content
-            current_hash = hashlib.md5(image_content).hexdigest()
-            last_hash = load_last_pic_hash()
-            
-            if current_hash != last_hash:
-                is_updated = 1
-                print("New picture detected (hashes do not match). Saving new image.")
-                save_last_pic_hash(current_hash)
-                ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"{ts}_profile.jpg"
-                path = os.path.join(PIC_DIR, filename)
-                os.makedirs(PIC_DIR, exist_ok=True)
-                with open(path, "wb") as f:
-                    f.write(image_content)
-                print(f"Saved new image to {path}")
-
-        except requests.exceptions.RequestException as e:
-            print(f"Failed to download image for hashing: {e}")
-        
-        warsaw_tz = ZoneInfo("Europe/Warsaw")
-        timestamp_now = datetime.now(warsaw_tz)
-        formatted_timestamp = timestamp_now.strftime("%A, %d %B %Y %H:%M")
-
-        entry = {
-            "timestamp": formatted_timestamp,
-            "posts": posts,
-            "followers": followers,
-            "following": following,
-            "is_picture_updated": is_updated,
-        }
-        log_to_csv(entry)
-        return entry
+        posts, followers, following = _get_profile_stats(dom)
+        pic_url = pic_future.result() or dom["pic"]
+        return posts, followers, following, pic_url
 
     except Exception as e:
         print(f"An error occurred: {e}")
         if driver:
-            driver.save_screenshot("error_screenshot.png")
+            if reuse_driver:
+                # Don't hand a possibly broken session to the next username, even if the screenshot fails too
+                _discard_reusable_driver(driver)
+            try:
+                driver.save_screenshot(f"error_screenshot_{username}.png")
+            except WebDriverException as shot_error:
+                print(f"Could not save error screenshot: {shot_error}")
+            if reuse_driver:
+                try:
+                    driver.quit()
+                except WebDriverException:
+                    pass
         raise
     finally:
-        if driver:
+        api_pool.shutdown(wait=False)
+        if driver and not reuse_driver:
             driver.quit()
 
+def scrape_and_log(username: str, log=log_to_csv, reuse_driver: bool = False):
+    session_id = os.environ.get("INSTAGRAM_SESSION_ID")
+
+    # Fast path: the stats and og:image are in the server-rendered HTML, so only
+    # boot Chrome when that fails (login wall, markup change) or USE_SELENIUM=1.
+    result = None
+    http_tried = os.environ.get("USE_SELENIUM") != "1"
+    if http_tried:
+        result = _scrape_via_http(username, session_id)
+        if result:
+            print("Scraped profile via HTTP, skipping Selenium.")
+    if not result:
+        # The HTTP path's GET already met any login redirect, and Chrome is the fallback for exactly
+        # that case, so only spend a request probing the cookie when that path was skipped
+        result = _scrape_via_selenium(username, session_id, reuse_driver, probe_session=not http_tried)
+    posts, followers, following, pic_url_to_check = result
+
+    if not pic_url_to_check:
+        raise RuntimeError("Could not locate profile picture using any method.")
+
+    # One clock read per scrape: filenames use UTC (as the CI runner always has), the log uses Warsaw time
+    now = datetime.now(timezone.utc)
+    is_updated = 0
+    try:
+        # ADDED: Random delay before image download
+        time.sleep(random.uniform(2, 5))
+        last_state = load_last_pic_state(username)
+        # Validators only apply to the resource they came from, so send them for the same URL only
+        headers = {}
+        if last_state.get("url") == pic_url_to_check:
+            if last_state.get("etag"):
+                headers["If-None-Match"] = last_state["etag"]
+            if last_state.get("last_modified"):
+                headers["If-Modified-Since"] = last_state["last_modified"]
+        with _SESSION.get(pic_url_to_check, headers=headers, stream=True, timeout=30) as response:
+            if response.status_code == 304:
+                print("Picture not modified since last run (HTTP 304), skipping download.")
+            elif response.ok and _matches_last_download(response, last_state, pic_url_to_check):
+                print("Picture validators unchanged since last run, skipping download.")
+            else:
+                response.raise_for_status()
+                last_algo, _, last_hash = (last_state.get("hash") or "").rpartition(":")
+                # A bare hex hash is a pre-sha256 MD5; with no stored hash there's nothing legacy to compute
+                last_algo = (last_algo or "md5") if last_hash else PIC_HASH_ALGO
+                tmp_path, hashes = _download_to_temp(response, tuple(dict.fromkeys((PIC_HASH_ALGO, last_algo))))
+                current_hash = f"{PIC_HASH_ALGO}:{hashes[PIC_HASH_ALGO]}"
+
+                # Compare content, not URLs: Instagram rotates CDN URLs for identical images
+                if hashes[last_algo] != last_hash:
+                    is_updated = 1
+                    print("New picture detected (hashes do not match). Saving new image.")
+                    ts = now.strftime("%Y%m%d_%H%M%S")
+                    filename = f"{ts}_{username}_profile.jpg"
+                    path = os.path.join(PIC_DIR, filename)
+                    _store_picture(tmp_path, hashes[PIC_HASH_ALGO], path)
+                    print(f"Saved new image to {path}")
+                else:
+                    os.remove(tmp_path)
+                # One state write per download, after the picture is stored: validators saved before a
+                # failed download would make the next run skip a picture whose hash was never recorded
+                save_last_pic_state(
+                    username,
+                    hash=current_hash,
+                    url=pic_url_to_check,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
+
+    except requests.exceptions.RequestException as e:
+        print(f"Failed to download image for hashing: {e}")
+    
+    timestamp_now = now.astimezone(WARSAW_TZ)
+    formatted_timestamp = timestamp_now.strftime("%A, %d %B %Y %H:%M")
+
+    entry = {
+        "timestamp": formatted_timestamp,
+        "username": username,
+        "posts": posts,
+        "followers": followers,
+        "following": following,
+        "is_picture_updated": is_updated,
+    }
+    log(entry)
+    return entry
+
+def scrape_many(usernames: list[str], max_workers: int = 4) -> list[dict]:
+    # Scrapes are I/O bound (HTTP + WebDriver), so threads overlap the waits
+    # Selenium fallbacks reuse one driver per worker for the whole batch instead of relaunching Chrome
+    try:
+        with CsvLogger() as logger, ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda u: scrape_and_log(u, log=logger.write, reuse_driver=True), usernames))
+    finally:
+        quit_reusable_drivers()
+
 if __name__ == "__main__":
-    print(scrape_and_log("zlamp_a"))
+    usernames = [u.strip() for u in os.environ.get("IG_USERNAMES", "zlamp_a").split(",") if u.strip()]
+    if len(usernames) > 1:
+        print(scrape_many(usernames))
+    else:
+        print(scrape_and_log(usernames[0]))
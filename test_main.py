@@ -0,0 +1,411 @@
+import csv
+import hashlib
+import http.server
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # main keeps its state files relative to the cwd and caches them per process
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "_pic_state", None)
+    monkeypatch.setattr(main, "_log_has_header", None)
+    monkeypatch.setattr(main, "_made_dirs", set())
+    monkeypatch.setattr(main.time, "sleep", lambda *_: None)
+    return tmp_path
+
+
+@pytest.fixture
+def truncated_pic_url():
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            # Promise far more than is sent, then drop the connection
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", "100000")
+            self.end_headers()
+            self.wfile.write(b"x" * 1000)
+            self.wfile.flush()
+            self.close_connection = True
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/pic.jpg"
+    server.shutdown()
+
+
+PIC_BYTES = b"\xff\xd8 profile picture \xff\xd9"
+
+
+@pytest.fixture
+def pic_url():
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(PIC_BYTES)))
+            self.end_headers()
+            self.wfile.write(PIC_BYTES)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/pic.jpg"
+    server.shutdown()
+
+
+def _scrape_with_stored_hash(monkeypatch, url, stored_hash):
+    if stored_hash is not None:
+        with open(main.LAST_PIC_STATE_FILE, "w") as f:
+            json.dump({"bob": {"hash": stored_hash}}, f)
+    monkeypatch.setattr(main, "_scrape_via_http", lambda username, session_id: ("1", "2", "3", url))
+    monkeypatch.delenv("USE_SELENIUM", raising=False)
+    entry = main.scrape_and_log("bob")
+    monkeypatch.setattr(main, "_pic_state", None)
+    return entry, main.load_last_pic_state("bob")["hash"]
+
+
+def test_legacy_md5_hash_of_same_picture_is_not_an_update(workdir, pic_url, monkeypatch):
+    entry, stored = _scrape_with_stored_hash(monkeypatch, pic_url, hashlib.md5(PIC_BYTES).hexdigest())
+    assert entry["is_picture_updated"] == 0
+    assert stored == f"sha256:{hashlib.sha256(PIC_BYTES).hexdigest()}"
+
+
+def test_legacy_md5_hash_of_other_picture_is_an_update(workdir, pic_url, monkeypatch):
+    entry, stored = _scrape_with_stored_hash(monkeypatch, pic_url, hashlib.md5(b"old picture").hexdigest())
+    assert entry["is_picture_updated"] == 1
+    assert stored == f"sha256:{hashlib.sha256(PIC_BYTES).hexdigest()}"
+
+
+def test_first_download_computes_no_legacy_digest(workdir, pic_url, monkeypatch):
+    download = main._download_to_temp
+    seen = []
+    monkeypatch.setattr(main, "_download_to_temp", lambda response, algorithms: seen.append(algorithms) or download(response, algorithms))
+    entry, stored = _scrape_with_stored_hash(monkeypatch, pic_url, None)
+    assert seen == [("sha256",)]
+    assert entry["is_picture_updated"] == 1
+    assert stored == f"sha256:{hashlib.sha256(PIC_BYTES).hexdigest()}"
+
+
+def test_truncated_picture_download_still_logs_row(workdir, truncated_pic_url, monkeypatch):
+    monkeypatch.setattr(main, "_scrape_via_http", lambda username, session_id: ("1", "2", "3", truncated_pic_url))
+    monkeypatch.delenv("USE_SELENIUM", raising=False)
+
+    entry = main.scrape_and_log("bob")
+
+    assert entry["is_picture_updated"] == 0
+    with open(main.LOG_FILE, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(r["username"], r["posts"], r["is_picture_updated"]) for r in rows] == [("bob", "1", "0")]
+    # The partial temp file is cleaned up and no state is recorded for the failed download
+    assert not [n for n in os.listdir(main.PIC_DIR) if n.endswith(".part")]
+    assert not os.path.exists(main.LAST_PIC_STATE_FILE)
+
+
+NODE = shutil.which("node")
+
+# Minimal DOM for running _PROFILE_DOM_WAIT_JS outside a browser; "waited" records
+# whether the script had to fall back to observing mutations (i.e. wasn't ready at once)
+_WAIT_JS_HARNESS = """
+let waited = false;
+const metas = {"meta[name='description']": __DESC__};
+globalThis.document = {
+    querySelector: (sel) => (metas[sel] != null ? {content: metas[sel]} : null),
+    querySelectorAll: () => [],
+    documentElement: {},
+};
+globalThis.location = {pathname: __PATH__};
+globalThis.MutationObserver = class { constructor() { waited = true; } observe() {} disconnect() {} };
+(function () { __BODY__ }).apply(null, [50, __EXPECTED__, (d) => console.log(JSON.stringify({dom: d, waited}))]);
+"""
+
+
+def _run_wait_js(path, desc, username):
+    script = (
+        _WAIT_JS_HARNESS
+        .replace("__DESC__", json.dumps(desc))
+        .replace("__PATH__", json.dumps(path))
+        .replace("__EXPECTED__", json.dumps(main._profile_path(username)))
+        .replace("__BODY__", main._PROFILE_DOM_WAIT_JS)
+    )
+    out = subprocess.run([NODE, "-e", script], capture_output=True, text=True, check=True).stdout
+    return json.loads(out)
+
+
+class _FakeDriver:
+    def __init__(self, dom):
+        self.dom = dom
+
+    def execute_script(self, script):
+        return self.dom
+
+
+FULL_DESC = "31 Followers, 90 Following, 803 Posts - See Instagram photos and videos from alice"
+
+
+@pytest.mark.skipif(NODE is None, reason="node is needed to run the wait script")
+def test_wait_js_does_not_accept_previous_users_page():
+    result = _run_wait_js("/alice/", FULL_DESC, "bob")
+    assert result["waited"]
+    assert not main._on_profile(result["dom"], "bob")
+
+
+@pytest.mark.skipif(NODE is None, reason="node is needed to run the wait script")
+def test_wait_js_accepts_requested_profile_at_once():
+    result = _run_wait_js("/Bob/", FULL_DESC, "bob")
+    assert not result["waited"]
+    assert main._on_profile(result["dom"], "bob")
+
+
+DESC_CASES = [
+    (FULL_DESC, True),
+    ("1,234 Followers, 5 Following - See Instagram photos and videos from alice", False),
+    ("1.2M Followers, 10 Following, 2k Posts - See Instagram photos and videos from alice", True),
+    # A count needs at least one digit; punctuation alone isn't a post count
+    ("10 Followers, 2 Following, ... Posts - See Instagram photos and videos from alice", False),
+    ("See Instagram photos and videos from alice", False),
+]
+
+
+@pytest.mark.parametrize("desc, complete", DESC_CASES)
+def test_description_parser_needs_all_three_counts(desc, complete):
+    assert all(main._parse_stats_from_description(desc)) is complete
+
+
+@pytest.mark.skipif(NODE is None, reason="node is needed to run the wait script")
+@pytest.mark.parametrize("desc, complete", DESC_CASES)
+def test_wait_js_description_check_agrees_with_python(desc, complete):
+    result = _run_wait_js("/alice/", desc, "alice")
+    assert (not result["waited"]) is complete
+
+
+def test_polling_fallback_ignores_previous_users_page():
+    stale = {"stats": [], "desc": FULL_DESC, "login": False, "path": "/alice/", "pic": None}
+    assert main._read_profile_dom(_FakeDriver(stale), "bob") is None
+    assert main._read_profile_dom(_FakeDriver(dict(stale, path="/bob/")), "bob") is not None
+
+
+def _cdp_blocks(url):
+    # Network.setBlockedURLs semantics: "*" matches any run of characters, against the whole URL
+    return any(re.fullmatch(".*".join(map(re.escape, p.split("*"))), url) for p in main.BLOCKED_URL_PATTERNS)
+
+
+@pytest.mark.parametrize("url", [
+    "https://scontent-waw2-1.cdninstagram.com/v/t51.2885-19/123_n.jpg?stp=dst-jpg_s150x150&_nc_ht=scontent-waw2-1.cdninstagram.com&oh=00_AfB&oe=6710A0B1",
+    "https://scontent.cdninstagram.com/v/t51.2885-15/456_n.webp?efg=eyJ2ZW5jb2RlX3RhZyI6ImltYWdlIn0&_nc_cat=1",
+    "https://scontent.cdninstagram.com/o1/v/t16/f1/m82/abc.mp4?efg=eyJ2ZW5jb2RlX3RhZyI6InZ0c192b2QifQ&_nc_ht=scontent.cdninstagram.com",
+    "https://static.cdninstagram.com/rsrc.php/v3/yT/l/0,cross/abc123.css?_nc_x=Ij3Wp8lg5Kz",
+    "https://static.cdninstagram.com/rsrc.php/v3/yx/r/H1l_HHqi4p6.png",
+    "https://static.cdninstagram.com/rsrc.php/v4/yq/r/font.woff2?_nc_x=Ij3Wp8lg5Kz",
+    "https://www.instagram.com/api/v1/analytics/event/",
+    "https://graph.instagram.com/logging/tracking?ts=1",
+])
+def test_blocked_patterns_match_cdn_assets(url):
+    assert _cdp_blocks(url)
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.instagram.com/bob/",
+    "https://www.instagram.com/john.gifford/",
+    "https://www.instagram.com/trackingfan/",
+    "https://www.instagram.com/api/v1/users/web_profile_info/?username=bob",
+    "https://www.instagram.com/graphql/query",
+    "https://static.cdninstagram.com/rsrc.php/v3iJJb4/yT/l/en_US/abc123.js?_nc_x=Ij3Wp8lg5Kz",
+])
+def test_blocked_patterns_leave_page_and_scripts_alone(url):
+    assert not _cdp_blocks(url)
+
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_token_bucket_rejects_non_positive_rate(rate):
+    with pytest.raises(ValueError):
+        main.TokenBucket(rate, 1)
+
+
+def test_launched_chrome_processes_are_stopped(monkeypatch):
+    proc = subprocess.Popen(["sleep", "60"])
+    monkeypatch.setitem(main._chrome_procs, 9999, proc)
+    main._stop_chrome_procs()
+    assert proc.poll() is not None
+    assert 9999 not in main._chrome_procs
+
+
+class _DeadDriver:
+    def __init__(self):
+        self.quit_called = False
+
+    def get(self, url):
+        raise main.WebDriverException("invalid session id")
+
+    def save_screenshot(self, path):
+        raise main.WebDriverException("invalid session id")
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_dead_reused_driver_is_discarded_even_if_screenshot_fails(workdir, monkeypatch):
+    driver = _DeadDriver()
+    monkeypatch.setattr(main, "_reusable_drivers", {threading.get_ident(): driver})
+
+    with pytest.raises(main.WebDriverException):
+        main._scrape_via_selenium("bob", None, reuse_driver=True)
+
+    assert main._reusable_drivers == {}
+    assert driver.quit_called
+
+
+class _RecordingDriver:
+    def __init__(self, dom):
+        self.dom = dom
+        self.visited = []
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_async_script(self, script, *args):
+        return self.dom
+
+    def quit(self):
+        pass
+
+
+@pytest.mark.parametrize("reuse_driver, debug_port", [(True, None), (False, "9222")])
+def test_driver_that_may_hold_a_previous_page_is_reset_first(workdir, monkeypatch, reuse_driver, debug_port):
+    driver = _RecordingDriver({"stats": [], "desc": FULL_DESC, "login": False, "path": "/bob/", "pic": "http://x/p.jpg"})
+    monkeypatch.setattr(main, "CHROME_DEBUG_PORT", debug_port)
+    monkeypatch.setattr(main, "_build_driver", lambda: driver)
+    monkeypatch.setattr(main, "_reusable_drivers", {})
+
+    main._scrape_via_selenium("bob", None, reuse_driver=reuse_driver)
+
+    assert driver.visited == ["about:blank", "https://www.instagram.com/bob/"]
+
+
+def _response(status, location=None):
+    resp = main.requests.Response()
+    resp.status_code = status
+    if location:
+        resp.headers["Location"] = location
+    return resp
+
+
+@pytest.mark.parametrize("resp, expected", [
+    (_response(302, "https://www.instagram.com/accounts/login/?next=%2Fbob%2F"), True),
+    (_response(301, "/accounts/login/"), True),
+    (_response(302, "https://www.instagram.com/bob/"), False),
+    (_response(200), False),
+    (main.requests.exceptions.ConnectionError("offline"), False),
+])
+def test_session_probe_detects_login_redirect(monkeypatch, resp, expected):
+    def head(url, **kwargs):
+        assert kwargs["allow_redirects"] is False
+        assert kwargs["cookies"] == {"sessionid": "dead"}
+        if isinstance(resp, Exception):
+            raise resp
+        return resp
+
+    monkeypatch.setattr(main._SESSION, "head", head)
+    assert main._session_redirects_to_login("bob", "dead") is expected
+
+
+class _StopScrape(Exception):
+    pass
+
+
+@pytest.mark.parametrize("use_selenium, probe_expected", [(None, False), ("1", True)])
+def test_session_is_only_probed_when_http_path_was_skipped(workdir, monkeypatch, use_selenium, probe_expected):
+    calls = []
+
+    def fake_selenium(username, session_id, reuse_driver=False, probe_session=False):
+        calls.append(probe_session)
+        raise _StopScrape
+
+    if use_selenium:
+        monkeypatch.setenv("USE_SELENIUM", use_selenium)
+    else:
+        monkeypatch.delenv("USE_SELENIUM", raising=False)
+    monkeypatch.setattr(main, "_scrape_via_http", lambda username, session_id: None)
+    monkeypatch.setattr(main, "_scrape_via_selenium", fake_selenium)
+
+    with pytest.raises(_StopScrape):
+        main.scrape_and_log("bob")
+    assert calls == [probe_expected]
+
+
+@pytest.mark.parametrize("count, shown", [
+    (0, "0"), (803, "803"), (9999, "9999"), (10_000, "10K"), (12_345, "12.3K"), (99_999, "99.9K"),
+    (123_456, "123K"), (999_999, "999K"), (1_000_000, "1M"), (1_999_999, "1.9M"), (615_000_000, "615M"),
+    (2_500_000_000, "2.5B"),
+])
+def test_json_counts_are_logged_like_the_page_shows_them(count, shown):
+    assert main._display_count(count) == shown
+    # ...and in a form the description parser itself would produce
+    assert main._parse_stats_from_description(f"{shown} Posts, {shown} Followers, {shown} Following")[0] == shown
+
+
+HEAD_READ_SIZE = 16 * 1024
+
+
+@pytest.fixture
+def slow_body_profile(monkeypatch):
+    # "</head>" straddles the first 16 KiB read; the body only arrives once the test releases it,
+    # so a reader that doesn't stop at </head> would get "LATE-BODY" (after a stall)
+    head = b"<html><head><meta name=\"description\" content=\"" + FULL_DESC.encode() + b"\"><!-- "
+    head += b"x" * (HEAD_READ_SIZE - 3 - len(head) - len(b" -->")) + b" -->"
+    early = head + b"</head><body>"
+    early += b"y" * (2 * HEAD_READ_SIZE - len(early))
+    assert early.index(b"</head>") == HEAD_READ_SIZE - 3
+    late = b"LATE-BODY</body></html>"
+    release = threading.Event()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(early) + len(late)))
+            self.end_headers()
+            self.wfile.write(early)
+            self.wfile.flush()
+            release.wait(5)
+            try:
+                self.wfile.write(late)
+            except OSError:
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    get = main._SESSION.get
+    monkeypatch.setattr(main._SESSION, "get", lambda url, **kwargs: get(url.replace("https://www.instagram.com", base), **kwargs))
+    yield
+    release.set()
+    server.shutdown()
+
+
+def test_profile_html_stops_at_head_split_across_reads(workdir, slow_body_profile):
+    html_text = main._fetch_profile_html("bob", None)
+
+    assert "</head>" in html_text
+    assert "LATE-BODY" not in html_text
+    assert main._parse_stats_from_description(main._parse_meta_tags(html_text)["description"]) == ("803", "31", "90")